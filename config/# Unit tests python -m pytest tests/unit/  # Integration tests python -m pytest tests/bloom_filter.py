@@ -0,0 +1,75 @@
+import math
+import xxhash
+from typing import Iterator, Tuple, Union
+
+_MASK64 = (1 << 64) - 1
+
+class BloomFilter:
+    """Fixed-capacity Bloom filter using enhanced double hashing"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0  # Keys inserted (duplicates and false positives excluded)
+
+    def _hashes(self, key: Union[int, str, bytes]) -> Tuple[int, int]:
+        """Two 64-bit hashes of key
+
+        int keys are taken to be 64-bit hashes already (e.g. url_id), so only the
+        second hash is derived, using the splitmix64 finalizer.
+        """
+        if isinstance(key, int):
+            h2 = ((key ^ (key >> 30)) * 0xbf58476d1ce4e5b9) & _MASK64
+            h2 = ((h2 ^ (h2 >> 27)) * 0x94d049bb133111eb) & _MASK64
+            return key, h2 ^ (h2 >> 31)
+        
+        if isinstance(key, str):
+            key = key.encode('utf-8')
+        digest = xxhash.xxh3_128_intdigest(key)
+        return digest & _MASK64, digest >> 64
+
+    def _probes(self, key: Union[int, str, bytes]) -> Iterator[int]:
+        """Bit positions for key via enhanced double hashing (Dillinger-Manolios)
+
+        The growing step keeps probes distinct even when h2 is a multiple of
+        num_bits, which plain h1 + i * h2 collapses onto a single bit.
+        """
+        h1, h2 = self._hashes(key)
+        pos, step = h1 % self.num_bits, h2 % self.num_bits
+        for i in range(self.num_hashes):
+            yield pos
+            pos = (pos + step) % self.num_bits
+            step = (step + i + 1) % self.num_bits
+
+    def __contains__(self, key: Union[int, str, bytes]) -> bool:
+        bits = self.bits
+        for pos in self._probes(key):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def add(self, key: Union[int, str, bytes]) -> bool:
+        """Insert key, return False if it was (probably) already present"""
+        bits = self.bits
+        added = False
+        for pos in self._probes(key):
+            mask = 1 << (pos & 7)
+            # Only write bits that are not already set
+            if not bits[pos >> 3] & mask:
+                bits[pos >> 3] |= mask
+                added = True
+
+        if added:
+            self.count += 1
+        return added
+
+    def __len__(self) -> int:
+        return self.count
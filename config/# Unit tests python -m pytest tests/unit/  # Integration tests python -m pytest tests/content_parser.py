@@ -0,0 +1,139 @@
+import codecs
+import re
+from lxml import etree
+from typing import Dict, List, Optional
+
+class _PageExtractor:
+    """lxml parser target collecting title, visible text and links"""
+
+    _SKIP_TAGS = {'script', 'style', 'noscript', 'template'}
+
+    def __init__(self):
+        self.title_parts: List[str] = []
+        self.text_parts: List[str] = []
+        self.links: List[str] = []
+        self._skip_depth = 0
+        self._in_title = False
+
+    def start(self, tag, attrib):
+        # Tag boundaries separate words; data may arrive split across chunks
+        self.text_parts.append(' ')
+        if tag in self._SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag == 'title':
+            self._in_title = True
+        elif tag == 'a':
+            href = attrib.get('href')
+            if href:
+                self.links.append(href.strip())
+
+    def end(self, tag):
+        self.text_parts.append(' ')
+        if tag in self._SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == 'title':
+            self._in_title = False
+
+    def data(self, data):
+        if self._skip_depth:
+            return
+        if self._in_title:
+            self.title_parts.append(data)
+        else:
+            self.text_parts.append(data)
+
+    def close(self):
+        return None
+
+class HTMLStream:
+    """Feeds an HTML body to libxml2 chunk by chunk with a size cap"""
+
+    _SNIFF_BYTES = 1024  # HTML5 requires <meta charset> within the first 1024 bytes
+    _DECLARED_CHARSET = re.compile(rb'^(?:\xef\xbb\xbf|\xff\xfe|\xfe\xff)|<meta[^>]+charset', re.IGNORECASE)
+
+    def __init__(self, max_body_bytes: int, encoding: Optional[str] = None):
+        self.max_body_bytes = max_body_bytes
+        self.bytes_read = 0
+        self._extractor = _PageExtractor()
+        # Without a reported charset, the start of the body is buffered and sniffed first
+        self._parser = self._make_parser(encoding) if encoding else None
+        self._head = bytearray()
+
+    def _make_parser(self, encoding: str) -> etree.HTMLParser:
+        """Build a parser for the charset as reported, else Python's name for it, else UTF-8"""
+        candidates = [encoding]
+        try:
+            # Python's canonical name covers aliases libxml2 does not know (e.g. 'latin-1')
+            candidates.append(codecs.lookup(encoding).name)
+        except LookupError:
+            pass
+
+        for candidate in candidates:
+            try:
+                return etree.HTMLParser(target=self._extractor, encoding=candidate)
+            except LookupError:
+                continue
+        return etree.HTMLParser(target=self._extractor, encoding='utf-8')
+
+    def _start_sniffed(self) -> None:
+        """Create the parser for a body without a reported charset and feed the buffered head"""
+        head = bytes(self._head)
+        self._head = bytearray()
+        if self._DECLARED_CHARSET.search(head, 0, self._SNIFF_BYTES):
+            # libxml2 honours a BOM or <meta charset> when no encoding is forced
+            self._parser = etree.HTMLParser(target=self._extractor)
+        else:
+            # Undeclared: assume UTF-8 rather than libxml2's Latin-1 default
+            self._parser = etree.HTMLParser(target=self._extractor, encoding='utf-8')
+        if head:
+            self._parser.feed(head)
+
+    def feed(self, chunk: bytes) -> bool:
+        """Parse next chunk, return False once the body exceeds max_body_bytes"""
+        self.bytes_read += len(chunk)
+        if self.bytes_read > self.max_body_bytes:
+            return False
+
+        if self._parser is None:
+            self._head += chunk
+            if len(self._head) >= self._SNIFF_BYTES:
+                self._start_sniffed()
+        else:
+            self._parser.feed(chunk)
+        return True
+
+    def close(self) -> Dict:
+        """Finish parsing and return the extracted page"""
+        if self._parser is None:
+            self._start_sniffed()
+        try:
+            self._parser.close()
+        except etree.XMLSyntaxError:
+            pass  # Empty document
+
+        return {
+            'title': ' '.join(''.join(self._extractor.title_parts).split()),
+            'content': ' '.join(''.join(self._extractor.text_parts).split()),
+            'links': self._extractor.links
+        }
+
+class ContentParser:
+    """Extracts title, text content and links from HTML pages"""
+
+    def __init__(self, max_body_bytes: int = 2 * 1024 * 1024):
+        self.max_body_bytes = max_body_bytes
+
+    def stream(self, encoding: Optional[str] = None) -> HTMLStream:
+        """Start an incremental parse of a page body
+
+        encoding is the charset reported by the response, if any; without one
+        the charset is taken from a BOM or <meta charset>, else UTF-8.
+        """
+        return HTMLStream(self.max_body_bytes, encoding)
+
+    def parse_html(self, html_content: str, url: str) -> Dict:
+        """Parse a complete HTML document"""
+        body = html_content.encode('utf-8')
+        stream = HTMLStream(max_body_bytes=len(body), encoding='utf-8')
+        stream.feed(body)
+        return stream.close()
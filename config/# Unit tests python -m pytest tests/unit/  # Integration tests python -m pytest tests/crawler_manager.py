@@ -4,16 +4,16 @@
 import asyncio
 import aiohttp
 import logging
-from urllib.parse import urljoin, urlparse
+from urllib.parse import SplitResult, urljoin, urlsplit
 from dataclasses import dataclass
-from typing import List, Set, Optional
+from typing import List, Optional, Set
 import yaml
 import time
-from .url_frontier import URLFrontier
+from .url_frontier import URLFrontier, url_id
+from .bloom_filter import BloomFilter
 from .robots_parser import RobotsParser
 from .content_parser import ContentParser
 from .duplicate_detector import DuplicateDetector
-from .politeness_manager import PolitenessManager
 
 @dataclass
 class CrawledPage:
@@ -25,21 +25,55 @@ class CrawledPage:
     status_code: int
     content_type: str
 
+# Process-wide HTTP session shared by all crawls, closed when the last one finishes
+_shared_session: Optional[aiohttp.ClientSession] = None
+_session_users = 0
+
+def _acquire_session(crawler_config: dict) -> aiohttp.ClientSession:
+    """Get the shared crawl session, creating it on first use"""
+    global _shared_session, _session_users
+    if _shared_session is None or _shared_session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=crawler_config['max_connections'],
+            limit_per_host=crawler_config.get('max_per_host', 4),
+            enable_cleanup_closed=True,
+            use_dns_cache=True,
+            ttl_dns_cache=300
+        )
+        timeout = aiohttp.ClientTimeout(total=crawler_config['timeout'])
+        _shared_session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    _session_users += 1
+    return _shared_session
+
+async def _release_session() -> None:
+    """Release the shared crawl session, closing it after the last user"""
+    global _shared_session, _session_users
+    _session_users -= 1
+    if _session_users == 0 and _shared_session is not None:
+        await _shared_session.close()
+        _shared_session = None
+
 class CrawlerManager:
     def __init__(self, config_path: str):
         """Initialize crawler with configuration"""
         with open(config_path, 'r') as f:
             self.config = yaml.safe_load(f)
         
-        self.url_frontier = URLFrontier(max_size=self.config['crawler']['max_queue_size'])
-        self.robots_parser = RobotsParser()
-        self.content_parser = ContentParser()
-        self.duplicate_detector = DuplicateDetector()
-        self.politeness_manager = PolitenessManager(
-            delay_ms=self.config['crawler']['delay_ms']
+        self.url_frontier = URLFrontier(
+            max_size=self.config['crawler']['max_queue_size'],
+            delay_ms=self.config['crawler']['delay_ms'],
+            seen_capacity=self.config['crawler']['max_pages'] * 10
         )
+        self.robots_parser = RobotsParser(
+            max_cache_size=self.config['crawler'].get('robots_cache_size', 10000),
+            cache_only=self.config['crawler'].get('robots_cache_only', False)
+        )
+        self.content_parser = ContentParser(
+            max_body_bytes=self.config['crawler'].get('max_body_bytes', 2 * 1024 * 1024)
+        )
+        self.duplicate_detector = DuplicateDetector(capacity=self.config['crawler']['max_pages'])
         
-        self.crawled_urls: Set[str] = set()
+        self.crawled_urls = BloomFilter(capacity=self.config['crawler']['max_pages'])
         self.session: Optional[aiohttp.ClientSession] = None
         self.logger = logging.getLogger(__name__)
         
@@ -53,73 +87,91 @@ class CrawlerManager:
         
         # Add seed URLs to frontier
         for url in seed_urls:
-            await self.url_frontier.add_url(url, priority=1.0)
+            self.url_frontier.add_url(url, priority=1.0)
         
-        # Create HTTP session
-        connector = aiohttp.TCPConnector(limit=self.config['crawler']['max_connections'])
-        timeout = aiohttp.ClientTimeout(total=self.config['crawler']['timeout'])
-        self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        # Share one HTTP session (and its connection pool) across crawls
+        self.session = _acquire_session(self.config['crawler'])
+        self.robots_parser.session = self.session
         
         try:
-            # Start crawler workers
-            tasks = []
-            for i in range(self.config['crawler']['max_threads']):
-                task = asyncio.create_task(self._crawler_worker(f"worker-{i}"))
-                tasks.append(task)
-            
-            # Wait for completion or max pages limit
-            await asyncio.gather(*tasks)
+            await self._schedule_crawls()
             
         finally:
-            if self.session:
-                await self.session.close()
+            await _release_session()
+            self.session = None
             
         self.logger.info(f"Crawling completed. Total pages: {self.pages_crawled}")
     
-    async def _crawler_worker(self, worker_id: str) -> None:
-        """Individual crawler worker thread"""
-        self.logger.info(f"Starting crawler worker: {worker_id}")
+    async def _schedule_crawls(self) -> None:
+        """Pull ready URLs from the frontier and crawl each in its own bounded task"""
+        crawler_config = self.config['crawler']
+        max_inflight = crawler_config.get('max_inflight', crawler_config['max_threads'])
+        burst_limit = crawler_config.get('burst_limit', 0)
+        max_pages = crawler_config['max_pages']
+        in_flight: Set[asyncio.Task] = set()
         
-        while self.pages_crawled < self.config['crawler']['max_pages']:
-            try:
-                # Get next URL from frontier
-                url_info = await self.url_frontier.get_next_url()
-                if not url_info:
-                    await asyncio.sleep(1)
-                    continue
-                
-                url, priority = url_info
-                
-                # Skip if already crawled
-                if url in self.crawled_urls:
-                    continue
-                
-                # Check robots.txt
-                if not await self.robots_parser.can_crawl(url, 'SearchBot'):
-                    self.logger.debug(f"Robots.txt disallows crawling: {url}")
-                    continue
+        while self.pages_crawled < max_pages:
+            # Burst above the base pool size only while URLs are backing up
+            pool_size = max_inflight + burst_limit if self.url_frontier.size() > max_inflight else max_inflight
+            
+            # Never run more crawls than pages left, so pages_crawled cannot pass max_pages
+            pool_size = min(pool_size, max_pages - self.pages_crawled)
+            if len(in_flight) >= pool_size:
+                _, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                continue
+            
+            # Get next URL from frontier (domain delay already satisfied)
+            url_info = self.url_frontier.get_next_url()
+            if url_info:
+                url, _ = url_info
+                in_flight.add(asyncio.create_task(self._crawl_one(url)))
+                continue
+            
+            if not in_flight:
+                if self.url_frontier.is_empty():
+                    break  # Nothing queued and nothing can add more
+                await asyncio.sleep(self.url_frontier.seconds_until_ready())
+                continue
+            
+            # Wait for a domain to become ready or a crawl to add links
+            _, in_flight = await asyncio.wait(
+                in_flight,
+                timeout=self.url_frontier.seconds_until_ready(),
+                return_when=asyncio.FIRST_COMPLETED
+            )
+        
+        if in_flight:
+            await asyncio.gather(*in_flight)
+    
+    async def _crawl_one(self, url: str) -> None:
+        """Crawl a single frontier URL and queue its links"""
+        try:
+            # Skip if already crawled
+            uid = url_id(url)
+            if uid in self.crawled_urls:
+                return
+            
+            # Check robots.txt
+            if not await self.robots_parser.can_crawl(url, 'SearchBot'):
+                self.logger.debug(f"Robots.txt disallows crawling: {url}")
+                return
+            
+            # Crawl the page
+            crawled_page = await self._crawl_page(url)
+            if crawled_page:
+                self.crawled_urls.add(uid)
+                self.pages_crawled += 1
                 
-                # Apply politeness delay
-                domain = urlparse(url).netloc
-                await self.politeness_manager.wait_for_domain(domain)
+                # Process extracted links
+                await self._process_extracted_links(crawled_page.links, url)
                 
-                # Crawl the page
-                crawled_page = await self._crawl_page(url)
-                if crawled_page:
-                    self.crawled_urls.add(url)
-                    self.pages_crawled += 1
-                    
-                    # Process extracted links
-                    await self._process_extracted_links(crawled_page.links, url)
-                    
-                    # Store crawled page (implement based on your storage)
-                    await self._store_crawled_page(crawled_page)
-                    
-                    self.logger.info(f"Crawled ({self.pages_crawled}): {url}")
+                # Store crawled page (implement based on your storage)
+                await self._store_crawled_page(crawled_page)
                 
-            except Exception as e:
-                self.logger.error(f"Worker {worker_id} error: {e}")
-                await asyncio.sleep(5)
+                self.logger.info(f"Crawled ({self.pages_crawled}): {url}")
+            
+        except Exception as e:
+            self.logger.error(f"Error processing {url}: {e}")
     
     async def _crawl_page(self, url: str) -> Optional[CrawledPage]:
         """Crawl a single page"""
@@ -128,14 +180,23 @@ class CrawlerManager:
                 if response.status != 200:
                     return None
                 
+                # Reject non-HTML and oversized bodies from headers alone
                 content_type = response.headers.get('content-type', '')
                 if not content_type.startswith('text/html'):
                     return None
                 
-                html_content = await response.text()
+                max_body_bytes = self.content_parser.max_body_bytes
+                if response.content_length is not None and response.content_length > max_body_bytes:
+                    self.logger.debug(f"Body too large ({response.content_length} bytes): {url}")
+                    return None
                 
-                # Parse content
-                parsed_content = self.content_parser.parse_html(html_content, url)
+                # Parse content while streaming, aborting past the size cap
+                stream = self.content_parser.stream(encoding=response.charset)
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    if not stream.feed(chunk):
+                        self.logger.debug(f"Body exceeds {max_body_bytes} bytes: {url}")
+                        return None
+                parsed_content = stream.close()
                 
                 # Check for duplicates
                 if self.duplicate_detector.is_duplicate(parsed_content['content']):
@@ -157,37 +218,39 @@ class CrawlerManager:
             return None
     
     async def _process_extracted_links(self, links: List[str], base_url: str) -> None:
-        """Process and add extracted links to frontier"""
+        """Process and add extracted links to frontier in one batch"""
+        base_parsed = urlsplit(base_url)
+        candidates = []
         for link in links:
             try:
                 # Convert relative URLs to absolute
                 absolute_url = urljoin(base_url, link)
                 
                 # Basic URL validation
-                parsed = urlparse(absolute_url)
-                if parsed.scheme not in ['http', 'https']:
+                parsed = urlsplit(absolute_url)
+                if parsed.scheme not in ('http', 'https'):
                     continue
                 
                 # Calculate priority (simple heuristic)
-                priority = self._calculate_url_priority(absolute_url, base_url)
+                priority = self._calculate_url_priority(parsed, base_parsed)
                 
-                await self.url_frontier.add_url(absolute_url, priority)
+                candidates.append((absolute_url, priority, parsed.netloc))
                 
             except Exception as e:
                 self.logger.debug(f"Error processing link {link}: {e}")
+        
+        self.url_frontier.add_urls(candidates)
     
-    def _calculate_url_priority(self, url: str, referring_url: str) -> float:
-        """Calculate crawl priority for URL (0.0 to 1.0)"""
+    def _calculate_url_priority(self, url: SplitResult, referring_url: SplitResult) -> float:
+        """Calculate crawl priority for already-split URL (0.0 to 1.0)"""
         priority = 0.5  # Base priority
         
         # Higher priority for same domain
-        url_domain = urlparse(url).netloc
-        ref_domain = urlparse(referring_url).netloc
-        if url_domain == ref_domain:
+        if url.netloc == referring_url.netloc:
             priority += 0.2
         
         # Lower priority for deep URLs
-        path_depth = len(urlparse(url).path.strip('/').split('/'))
+        path_depth = len(url.path.strip('/').split('/'))
         priority -= path_depth * 0.05
         
         return max(0.0, min(1.0, priority))
@@ -211,11 +274,13 @@ class CrawlerManager:
             'elapsed_time': elapsed_time,
             'crawl_rate': crawl_rate,
             'queue_size': self.url_frontier.size(),
+            'robots_cached_hosts': self.robots_parser.cache_size(),
             'unique_urls': len(self.crawled_urls)
         }
 
 if __name__ == "__main__":
     import argparse
+    import os
     
     parser = argparse.ArgumentParser(description='Web Crawler')
     parser.add_argument('--config', default='config/development.yaml', 
@@ -232,6 +297,15 @@ if __name__ == "__main__":
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
     
+    # Run on uvloop's C event loop when available; CRAWLER_UVLOOP=0 keeps asyncio's default
+    run = asyncio.run
+    if os.environ.get('CRAWLER_UVLOOP', '1') != '0':
+        try:
+            import uvloop
+            run = uvloop.run
+        except ImportError:
+            logging.getLogger(__name__).warning("uvloop not installed, using default event loop")
+    
     # Start crawler
     crawler = CrawlerManager(args.config)
-    asyncio.run(crawler.start_crawling(args.seeds))
+    run(crawler.start_crawling(args.seeds))
@@ -0,0 +1,77 @@
+import logging
+import math
+import zlib
+import numpy as np
+from .bloom_filter import BloomFilter
+
+class DuplicateDetector:
+    """Near-duplicate content detector using MinHash LSH with Bloom-filter bands (LSHBloom)"""
+
+    _PRIME = (1 << 32) + 15  # Smallest prime above the 32-bit shingle hash range
+    _CHUNK = 4096  # Shingles hashed per vectorized step
+    _HEADROOM = 1.5  # Band filter size relative to capacity
+
+    def __init__(self, capacity: int = 1000000, error_rate: float = 0.001, num_perm: int = 128,
+                 bands: int = 32, shingle_size: int = 5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        # Universal hash family h(x) = (a * x + b) mod p, one (a, b) per permutation
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+        # Split the overall false-positive budget across bands: 1 - (1 - p)^(1/b)
+        band_error_rate = 1 - (1 - error_rate) ** (1 / bands)
+        band_capacity = math.ceil(capacity * self._HEADROOM)
+        self.band_filters = [BloomFilter(band_capacity, band_error_rate) for _ in range(bands)]
+        self.logger = logging.getLogger(__name__)
+
+    def _shingle_hashes(self, content: str) -> np.ndarray:
+        """Hash word shingles of content to 32-bit values"""
+        tokens = content.lower().split()
+        k = self.shingle_size
+        if len(tokens) <= k:
+            shingles = {' '.join(tokens)}
+        else:
+            shingles = {' '.join(tokens[i:i + k]) for i in range(len(tokens) - k + 1)}
+
+        return np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles),
+                           dtype=np.uint64, count=len(shingles))
+
+    def signature(self, content: str) -> np.ndarray:
+        """Compute MinHash signature of content"""
+        hashes = self._shingle_hashes(content)
+        signature = np.full(self.num_perm, self._PRIME, dtype=np.uint64)
+
+        # a, x < 2^32 so a * x + b cannot overflow uint64
+        for start in range(0, len(hashes), self._CHUNK):
+            chunk = hashes[start:start + self._CHUNK, None]
+            np.minimum(signature, ((chunk * self._a + self._b) % self._PRIME).min(axis=0), out=signature)
+
+        return signature
+
+    def is_duplicate(self, content: str) -> bool:
+        """Check if content near-duplicates a previously seen page, remembering it if not"""
+        if not content or not content.strip():
+            return False
+
+        signature = self.signature(content)
+        band_keys = [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+        # Any band already present means a collision; rejected pages are not
+        # inserted, so filter load stays bounded by accepted pages
+        for band, (band_filter, band_key) in enumerate(zip(self.band_filters, band_keys)):
+            if band_key in band_filter:
+                self.logger.debug(f"Near-duplicate content: band {band} collided")
+                return True
+
+        for band_filter, band_key in zip(self.band_filters, band_keys):
+            band_filter.add(band_key)
+
+        return False
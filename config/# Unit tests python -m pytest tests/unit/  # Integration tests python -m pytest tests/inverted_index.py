@@ -1,95 +1,181 @@
-import pickle
-import json
-from typing import Dict, List, Set, Optional
-from collections import defaultdict
+import os
+import shutil
+import struct
+import tempfile
+import time
+from array import array
+from contextlib import contextmanager
+from itertools import repeat
+from typing import Dict, List, Optional, Tuple
+from collections import Counter
 import math
 import logging
+import msgpack
+import numpy as np
+import xxhash
+import zstandard
+
+def _doc_key(doc_id: str) -> int:
+    """64-bit hash of a doc id (URL), cheaper to hash and compare than the string"""
+    return xxhash.xxh3_64_intdigest(doc_id.encode('utf-8'))
+
+@contextmanager
+def _atomic_write(path: str, mode: str = 'wb'):
+    """Write to a private temp file beside path and rename it over path on success
+    
+    Concurrent writers each get their own temp file, and readers (including
+    existing memory maps of the old file) never see a partial one.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=f".{os.path.basename(path)}.")
+    try:
+        with os.fdopen(fd, mode) as f:
+            os.fchmod(f.fileno(), 0o644)  # mkstemp creates 0600; keep the index readable by other users
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
 
 class InvertedIndex:
     """Inverted index implementation for fast text search"""
     
     def __init__(self):
-        self.index: Dict[str, Dict[str, float]] = defaultdict(dict)  # term -> {doc_id: tf_idf}
+        self.term_ids: Dict[str, int] = {}  # term -> posting row
+        self.doc_table: List[str] = []  # doc row -> doc_id
+        self.doc_rows: Dict[int, int] = {}  # _doc_key(doc_id) -> doc row
+        
+        # CSR postings: term row t owns [term_offsets[t], term_offsets[t + 1])
+        self.term_offsets = np.zeros(1, dtype=np.int64)
+        self.doc_ids = np.zeros(0, dtype=np.int32)  # doc rows, ascending within a term
+        self.tf = np.zeros(0, dtype=np.float32)
+        self.scores = np.zeros(0, dtype=np.float32)  # tf * idf
+        
         self.document_count = 0
-        self.term_document_count: Dict[str, int] = defaultdict(int)  # term -> number of docs containing term
-        self.document_lengths: Dict[str, int] = {}  # doc_id -> document length
+        self.document_lengths = array('i')  # doc row -> document length
+        
+        self._reset_pending()
         self.logger = logging.getLogger(__name__)
         
+    def _reset_pending(self) -> None:
+        """Start new typed buffers for postings added before the next calculate_tfidf_scores()"""
+        self._pending_terms = array('i')  # term rows
+        self._pending_docs = array('i')  # doc rows
+        self._pending_tf = array('f')
+    
     def add_document(self, doc_id: str, terms: List[str]) -> None:
-        """Add a document to the index"""
+        """Add a document to the index (searchable after calculate_tfidf_scores)"""
         if not terms:
             return
+        
+        doc_key = _doc_key(doc_id)
+        if doc_key in self.doc_rows:
+            self.logger.warning(f"Document {doc_id} already indexed, skipping")
+            return
             
         # Calculate term frequencies
-        term_freq = defaultdict(int)
-        for term in terms:
-            term_freq[term] += 1
+        term_freq = Counter(terms)
         
-        # Store document length
-        self.document_lengths[doc_id] = len(terms)
+        doc_row = len(self.doc_table)
+        self.doc_table.append(doc_id)
+        self.doc_rows[doc_key] = doc_row
         
-        # Update term-document counts
-        unique_terms = set(terms)
-        for term in unique_terms:
-            if doc_id not in self.index[term]:
-                self.term_document_count[term] += 1
+        # Store document length
+        self.document_lengths.append(len(terms))
         
-        # Calculate TF-IDF scores
-        for term, freq in term_freq.items():
-            tf = freq / len(terms)  # Term frequency
-            self.index[term][doc_id] = tf
+        # Queue (term, doc, tf) postings; arrays grow geometrically, so appends stay amortized O(1)
+        term_ids = self.term_ids
+        self._pending_terms.extend(term_ids.setdefault(term, len(term_ids)) for term in term_freq)
+        self._pending_docs.extend(repeat(doc_row, len(term_freq)))
+        self._pending_tf.extend(freq / len(terms) for freq in term_freq.values())  # Term frequency
         
         self.document_count += 1
-        self.logger.debug(f"Indexed document {doc_id} with {len(unique_terms)} unique terms")
+        self.logger.debug(f"Indexed document {doc_id} with {len(term_freq)} unique terms")
+    
+    def _merge_pending(self) -> None:
+        """Merge queued postings into the CSR arrays"""
+        if not self._pending_terms:
+            return
+        
+        num_terms = len(self.term_ids)
+        row_counts = np.diff(self.term_offsets)
+        existing_terms = np.repeat(np.arange(len(row_counts), dtype=np.int32), row_counts)
+        
+        # Buffers are viewed in place, not converted element by element
+        posting_terms = np.concatenate([existing_terms, np.frombuffer(self._pending_terms, dtype=np.intc)])
+        doc_ids = np.concatenate([self.doc_ids, np.frombuffer(self._pending_docs, dtype=np.intc)])
+        tf = np.concatenate([self.tf, np.frombuffer(self._pending_tf, dtype=np.float32)])
+        
+        # Stable sort keeps doc rows ascending within each term
+        order = np.argsort(posting_terms, kind='stable')
+        self.doc_ids = doc_ids[order]
+        self.tf = tf[order]
+        self.term_offsets = np.zeros(num_terms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(posting_terms, minlength=num_terms), out=self.term_offsets[1:])
+        
+        self._reset_pending()
+    
+    def _posting_range(self, term: str) -> Optional[Tuple[int, int]]:
+        """Get [start, end) of a term's postings, None if not searchable"""
+        row = self.term_ids.get(term)
+        if row is None or row + 1 >= len(self.term_offsets):
+            return None
+        return int(self.term_offsets[row]), int(self.term_offsets[row + 1])
     
     def calculate_tfidf_scores(self) -> None:
         """Calculate TF-IDF scores for all terms after all documents are added"""
         self.logger.info("Calculating TF-IDF scores...")
         
-        for term, doc_scores in self.index.items():
-            # Calculate IDF
-            df = self.term_document_count[term]  # Document frequency
-            idf = math.log(self.document_count / df) if df > 0 else 0
-            
-            # Update scores to TF-IDF
-            for doc_id in doc_scores:
-                tf = doc_scores[doc_id]
-                self.index[term][doc_id] = tf * idf
+        self._merge_pending()
+        
+        # Every term row has at least one posting, so df > 0
+        df = np.diff(self.term_offsets)
+        idf = np.log(self.document_count / df).astype(np.float32)
+        
+        self.scores = self.tf * np.repeat(idf, df)
     
     def search(self, query_terms: List[str], limit: int = 10) -> List[Tuple[str, float]]:
         """Search for documents matching query terms"""
-        if not query_terms:
+        if not query_terms or limit <= 0:
             return []
         
-        # Get candidate documents
-        candidate_docs: Set[str] = set()
-        for term in query_terms:
-            if term in self.index:
-                candidate_docs.update(self.index[term].keys())
-        
-        if not candidate_docs:
+        # Gather the posting slices of all query terms
+        posting_ranges = [r for r in map(self._posting_range, query_terms) if r is not None]
+        if not posting_ranges:
             return []
         
-        # Calculate relevance scores
-        doc_scores = defaultdict(float)
-        for term in query_terms:
-            if term in self.index:
-                for doc_id in candidate_docs:
-                    if doc_id in self.index[term]:
-                        doc_scores[doc_id] += self.index[term][doc_id]
+        doc_ids = np.concatenate([self.doc_ids[start:end] for start, end in posting_ranges])
+        scores = np.concatenate([self.scores[start:end] for start, end in posting_ranges])
         
-        # Sort by relevance score
-        results = sorted(doc_scores.items(), key=lambda x: x[1], reverse=True)
+        # Sum scores per document; touches only query postings, not every document
+        candidates, inverse = np.unique(doc_ids, return_inverse=True)
+        doc_scores = np.bincount(inverse, weights=scores, minlength=len(candidates))
         
-        return results[:limit]
+        # Top-k selection, then sort only the selected results; ties keep doc row order
+        if limit < len(candidates):
+            kth = doc_scores[np.argpartition(doc_scores, -limit)[-limit]]
+            above = np.flatnonzero(doc_scores > kth)
+            # candidates is sorted, so the first tied indices are the lowest doc rows
+            tied = np.flatnonzero(doc_scores == kth)[:limit - len(above)]
+            top = np.concatenate((above, tied))
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.lexsort((candidates[top], -doc_scores[top]))]
+        
+        return [(self.doc_table[doc_row], score)
+                for doc_row, score in zip(candidates[top].tolist(), doc_scores[top].tolist())]
     
     def get_term_stats(self, term: str) -> Dict:
         """Get statistics for a term"""
-        if term not in self.index:
+        posting_range = self._posting_range(term)
+        if posting_range is None:
             return {"term": term, "document_count": 0, "total_frequency": 0}
         
-        doc_count = len(self.index[term])
-        total_freq = sum(self.index[term].values())
+        start, end = posting_range
+        doc_count = end - start
+        total_freq = float(self.scores[start:end].sum())
         
         return {
             "term": term,
@@ -98,40 +184,208 @@ class InvertedIndex:
             "idf": math.log(self.document_count / doc_count) if doc_count > 0 else 0
         }
     
-    def save_to_file(self, filepath: str) -> None:
-        """Save index to file"""
-        data = {
-            'index': dict(self.index),
+    _CONTAINER = 'index.zst'
+    _COPY_CHUNK = 1 << 20
+    _STALE_FILL_SECONDS = 3600  # Age after which an unfinished cache fill is assumed abandoned
+    
+    def save_to_file(self, dirpath: str) -> None:
+        """Save index to dirpath as one zstd-compressed container
+        
+        The stream holds a length-prefixed msgpack header (sorted terms, doc ids,
+        counts and array descriptors) followed by the raw bytes of each array:
+        term_offsets (each term's posting range), postings, tf, scores and
+        doc_lengths.
+        """
+        if self._pending_terms:
+            self.calculate_tfidf_scores()
+        
+        os.makedirs(dirpath, exist_ok=True)
+        
+        # Reorder term rows so terms are stored sorted
+        sorted_terms = sorted(self.term_ids)
+        rows = np.fromiter((self.term_ids[term] for term in sorted_terms), dtype=np.int64, count=len(sorted_terms))
+        counts = np.diff(self.term_offsets)[rows]
+        term_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(counts, out=term_offsets[1:])
+        gather = np.repeat(self.term_offsets[rows] - term_offsets[:-1], counts) + np.arange(term_offsets[-1])
+        
+        arrays = [
+            ('term_offsets', term_offsets),
+            ('postings', self.doc_ids[gather]),
+            ('tf', self.tf[gather]),
+            ('scores', self.scores[gather]),
+            ('doc_lengths', np.frombuffer(self.document_lengths, dtype=np.intc).astype(np.int32))
+        ]
+        header = msgpack.packb({
             'document_count': self.document_count,
-            'term_document_count': dict(self.term_document_count),
-            'document_lengths': self.document_lengths
-        }
+            'terms': sorted_terms,
+            'docs': self.doc_table,
+            'arrays': [[name, values.dtype.str, len(values)] for name, values in arrays]
+        })
+        
+        with _atomic_write(os.path.join(dirpath, self._CONTAINER)) as f:
+            with zstandard.ZstdCompressor(level=3).stream_writer(f, closefd=False) as writer:
+                writer.write(struct.pack('<I', len(header)))
+                writer.write(header)
+                for _, values in arrays:
+                    writer.write(np.ascontiguousarray(values).data)
+        
+        self.logger.info(f"Index saved to {dirpath}")
+    
+    @staticmethod
+    def _read_exact(reader, size: int) -> bytes:
+        """Read exactly size bytes from a decompression stream"""
+        chunks = []
+        while size > 0:
+            chunk = reader.read(size)
+            if not chunk:
+                raise ValueError("Truncated index file")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+    
+    @classmethod
+    @contextmanager
+    def _open_arrays(cls, f):
+        """Decompress an open container from the start, yielding its header and a stream at the arrays"""
+        f.seek(0)
+        with zstandard.ZstdDecompressor().stream_reader(f, closefd=False) as reader:
+            header_size, = struct.unpack('<I', cls._read_exact(reader, 4))
+            yield msgpack.unpackb(cls._read_exact(reader, header_size)), reader
+    
+    @staticmethod
+    def _map_cached(version_dir: str, header: Dict) -> Optional[Dict[str, np.ndarray]]:
+        """Memory-map a cached copy of the arrays read-only, or None if it is missing or incomplete"""
+        arrays = {}
+        try:
+            for name, dtype, count in header['arrays']:
+                dtype = np.dtype(dtype)
+                path = os.path.join(version_dir, name)
+                if os.path.getsize(path) != dtype.itemsize * count:
+                    return None
+                # Empty files cannot be mapped
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r') if count else np.zeros(0, dtype=dtype)
+        except OSError:
+            return None
+        return arrays
+    
+    @staticmethod
+    def _discard_cache(cache_root: str, path: str) -> None:
+        """Delete a cache entry; directories are first renamed aside so none is seen half-deleted"""
+        if not os.path.isdir(path):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            return
         
-        with open(filepath, 'wb') as f:
-            pickle.dump(data, f)
+        trash_dir = tempfile.mkdtemp(dir=cache_root, prefix='.fill-')
+        try:
+            os.rename(path, trash_dir)
+        except OSError:
+            pass  # Already discarded by another loader
+        shutil.rmtree(trash_dir, ignore_errors=True)
+    
+    def _fill_cache(self, f, cache_root: str, version_dir: str) -> None:
+        """Decompress the arrays of an open container into version_dir
+        
+        Arrays are written to a private directory that is renamed into place
+        whole, so concurrent loaders never see a partial or mixed-version copy.
+        """
+        os.makedirs(cache_root, exist_ok=True)
+        fill_dir = tempfile.mkdtemp(dir=cache_root, prefix='.fill-')
+        try:
+            with self._open_arrays(f) as (header, reader):
+                # Stream each array into its cache file without holding it in memory
+                for name, dtype, count in header['arrays']:
+                    remaining = np.dtype(dtype).itemsize * count
+                    with open(os.path.join(fill_dir, name), 'wb') as out:
+                        while remaining > 0:
+                            chunk = self._read_exact(reader, min(remaining, self._COPY_CHUNK))
+                            out.write(chunk)
+                            remaining -= len(chunk)
+            os.chmod(fill_dir, 0o755)  # mkdtemp creates 0700
+            os.rename(fill_dir, version_dir)
+        except BaseException as e:
+            shutil.rmtree(fill_dir, ignore_errors=True)
+            # Losing the rename to another loader of the same version is fine
+            if isinstance(e, OSError) and os.path.isdir(version_dir):
+                return
+            raise
         
-        self.logger.info(f"Index saved to {filepath}")
+        # Drop other versions and fills abandoned by crashed loaders; processes
+        # still mapping a dropped version keep their pages
+        for entry in os.listdir(cache_root):
+            path = os.path.join(cache_root, entry)
+            if path == version_dir:
+                continue
+            if entry.startswith('.fill-'):
+                try:
+                    if time.time() - os.path.getmtime(path) < self._STALE_FILL_SECONDS:
+                        continue
+                except OSError:
+                    continue
+            self._discard_cache(cache_root, path)
     
-    def load_from_file(self, filepath: str) -> None:
-        """Load index from file"""
-        with open(filepath, 'rb') as f:
-            data = pickle.load(f)
+    def load_from_file(self, dirpath: str, cache_dir: Optional[str] = None) -> None:
+        """Load index from a directory written by save_to_file, mapping postings lazily
+        
+        Arrays are decompressed once into a per-version directory under cache_dir
+        (default dirpath/cache) and memory-mapped from there; the cache is reused
+        until the container changes. If cache_dir cannot be written the arrays are
+        loaded into memory instead.
+        """
+        cache_root = cache_dir or os.path.join(dirpath, 'cache')
+        
+        # Header, arrays and cache key all come from this one open file, even if
+        # save_to_file replaces the container meanwhile
+        with open(os.path.join(dirpath, self._CONTAINER), 'rb') as f:
+            container = os.fstat(f.fileno())
+            version_dir = os.path.join(
+                cache_root, f"{container.st_ino:x}-{container.st_size:x}-{container.st_mtime_ns:x}")
+            with self._open_arrays(f) as (header, _):
+                pass
+            
+            arrays = self._map_cached(version_dir, header)
+            if arrays is None:
+                try:
+                    if os.path.isdir(version_dir):
+                        # Present but incomplete (e.g. truncated by a crash): rebuild it
+                        self._discard_cache(cache_root, version_dir)
+                    self._fill_cache(f, cache_root, version_dir)
+                    arrays = self._map_cached(version_dir, header)
+                except OSError as e:
+                    self.logger.warning(f"Cannot write index cache {cache_root} ({e}), loading arrays into memory")
+            
+            if arrays is None:
+                with self._open_arrays(f) as (_, reader):
+                    arrays = {name: np.frombuffer(self._read_exact(reader, np.dtype(dtype).itemsize * count), dtype=dtype)
+                              for name, dtype, count in header['arrays']}
+        
+        self.term_ids = {term: row for row, term in enumerate(header['terms'])}
+        self.doc_table = header['docs']
+        self.doc_rows = {_doc_key(doc_id): row for row, doc_id in enumerate(self.doc_table)}
+        
+        self.term_offsets = arrays['term_offsets']
+        self.doc_ids = arrays['postings']
+        self.tf = arrays['tf']
+        self.scores = arrays['scores']
+        self.document_lengths = array('i')
+        self.document_lengths.frombytes(np.asarray(arrays['doc_lengths']).astype(np.intc).tobytes())
+        self.document_count = header['document_count']
         
-        self.index = defaultdict(dict, data['index'])
-        self.document_count = data['document_count']
-        self.term_document_count = defaultdict(int, data['term_document_count'])
-        self.document_lengths = data['document_lengths']
+        self._reset_pending()
         
-        self.logger.info(f"Index loaded from {filepath}")
+        self.logger.info(f"Index loaded from {dirpath}")
     
     def get_index_stats(self) -> Dict:
         """Get overall index statistics"""
-        total_terms = len(self.index)
-        total_postings = sum(len(docs) for docs in self.index.values())
+        total_terms = len(self.term_ids)
+        total_postings = len(self.doc_ids) + len(self._pending_terms)
         
         return {
             "total_documents": self.document_count,
             "total_terms": total_terms,
             "total_postings": total_postings,
-            "average_document_length": sum(self.document_lengths.values()) / len(self.document_lengths) if self.document_lengths else 0
+            "average_document_length": sum(self.document_lengths) / len(self.document_lengths) if self.document_lengths else 0
         }
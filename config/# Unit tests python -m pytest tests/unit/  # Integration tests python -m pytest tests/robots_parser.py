@@ -0,0 +1,77 @@
+import asyncio
+import aiohttp
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+class RobotsParser:
+    """robots.txt checker with an LRU cache of parsed rules per host"""
+
+    def __init__(self, max_cache_size: int = 10000, cache_only: bool = False, timeout: float = 10):
+        self.max_cache_size = max_cache_size
+        self.cache_only = cache_only  # Allow uncached hosts and fetch their rules in the background
+        self.timeout = timeout
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._cache: OrderedDict[str, RobotFileParser] = OrderedDict()  # scheme://netloc -> rules
+        self._pending: Dict[str, asyncio.Task] = {}
+        self.logger = logging.getLogger(__name__)
+
+    async def can_crawl(self, url: str, user_agent: str = '*') -> bool:
+        """Check whether user_agent may fetch url"""
+        parsed = urlsplit(url)
+        host = f"{parsed.scheme}://{parsed.netloc}"
+
+        rules = self._cache.get(host)
+        if rules is not None:
+            self._cache.move_to_end(host)
+            return rules.can_fetch(user_agent, url)
+
+        # Share one fetch between all callers waiting on the same host
+        task = self._pending.get(host)
+        if task is None:
+            task = asyncio.create_task(self._fetch_rules(host))
+            self._pending[host] = task
+
+        if self.cache_only:
+            return True
+
+        rules = await task
+        return rules.can_fetch(user_agent, url)
+
+    async def _fetch_rules(self, host: str) -> RobotFileParser:
+        """Download and parse robots.txt for host, then cache it"""
+        rules = RobotFileParser(f"{host}/robots.txt")
+        try:
+            session = self.session
+            owns_session = session is None or session.closed
+            if owns_session:
+                session = aiohttp.ClientSession()
+            try:
+                timeout = aiohttp.ClientTimeout(total=self.timeout)
+                async with session.get(rules.url, timeout=timeout) as response:
+                    if response.status == 200:
+                        rules.parse((await response.text()).splitlines())
+                    elif response.status in (401, 403):
+                        rules.disallow_all = True
+                    else:
+                        rules.allow_all = True
+            finally:
+                if owns_session:
+                    await session.close()
+        except Exception as e:
+            self.logger.debug(f"Error fetching {rules.url}: {e}")
+            rules.allow_all = True
+        finally:
+            self._pending.pop(host, None)
+
+        self._cache[host] = rules
+        if len(self._cache) > self.max_cache_size:
+            self._cache.popitem(last=False)
+
+        return rules
+
+    def cache_size(self) -> int:
+        """Get number of hosts with cached rules"""
+        return len(self._cache)
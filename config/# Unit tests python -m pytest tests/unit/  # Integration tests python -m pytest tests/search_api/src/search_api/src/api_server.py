@@ -1,8 +1,10 @@
 from flask import Flask, request, jsonify, render_template
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import logging
+import os
 import time
 import json
+import ahocorasick
 from ..indexer.src.inverted_index import InvertedIndex
 from ..ranking.src.query_processor import QueryProcessor
 from ..storage.src.document_store import DocumentStore
@@ -20,7 +22,7 @@ class SearchAPI:
         
         # Load index on startup
         try:
-            self.inverted_index.load_from_file('data/inverted_index.pkl')
+            self.inverted_index.load_from_file('data/inverted_index')
             self.logger.info("Search index loaded successfully")
         except FileNotFoundError:
             self.logger.warning("No existing index found. Please build index first.")
@@ -46,7 +48,9 @@ class SearchAPI:
             limit=limit * 5  # Get more results for better ranking
         )
         
-        # Get document details
+        # Get document details; lowercase query terms once, not per result
+        query_terms_lower = [term.lower() for term in processed_query['terms']]
+        term_automaton = self._build_term_automaton(query_terms_lower)
         results = []
         start_idx = (page - 1) * limit
         end_idx = start_idx + limit
@@ -57,7 +61,9 @@ class SearchAPI:
                 results.append({
                     'title': doc_info.get('title', 'Untitled'),
                     'url': doc_info.get('url', ''),
-                    'snippet': self._generate_snippet(doc_info.get('content', ''), processed_query['terms']),
+                    'snippet': self._generate_snippet(doc_info.get('content', ''), query_terms_lower,
+                                                      automaton=term_automaton,
+                                                      content_lower=doc_info.get('content_lower')),
                     'score': round(relevance_score, 4)
                 })
         
@@ -72,19 +78,57 @@ class SearchAPI:
             'processing_time': round(processing_time, 3)
         }
     
-    def _generate_snippet(self, content: str, query_terms: List[str], max_length: int = 160) -> str:
-        """Generate snippet highlighting query terms"""
-        if not content or not query_terms:
-            return content[:max_length] + "..." if len(content) > max_length else content
+    def _build_term_automaton(self, query_terms_lower: List[str]) -> Optional[ahocorasick.Automaton]:
+        """Build an Aho-Corasick automaton over lowercased query terms (value = term length)"""
+        automaton = ahocorasick.Automaton()
+        for term in query_terms_lower:
+            if term:
+                automaton.add_word(term, len(term))
+        
+        if automaton.kind == ahocorasick.EMPTY:
+            return None
+        
+        automaton.make_automaton()
+        return automaton
+    
+    def _find_first_match(self, text_lower: str, automaton: ahocorasick.Automaton, longest_term: int) -> int:
+        """Start of the earliest term match in text_lower, len(text_lower) if none"""
+        # Matches arrive ordered by end position, so stop once no longer term could start earlier
+        first_match = len(text_lower)
+        for end, term_length in automaton.iter(text_lower):
+            if end - longest_term + 1 >= first_match:
+                break
+            first_match = min(first_match, end - term_length + 1)
+        return first_match
+    
+    def _generate_snippet(self, content: str, query_terms_lower: List[str], max_length: int = 160,
+                          automaton: Optional[ahocorasick.Automaton] = None,
+                          content_lower: Optional[str] = None) -> str:
+        """Generate snippet highlighting (already lowercased) query terms"""
+        if automaton is None and query_terms_lower:
+            automaton = self._build_term_automaton(query_terms_lower)
         
-        # Find first occurrence of any query term
-        content_lower = content.lower()
-        first_match = len(content)
+        if not content or automaton is None:
+            return content[:max_length] + "..." if len(content) > max_length else content
         
-        for term in query_terms:
-            pos = content_lower.find(term.lower())
-            if pos != -1 and pos < first_match:
-                first_match = pos
+        longest_term = max(automaton.values())
+        if content_lower is not None:
+            # Stored lowercase copy: one scan, no per-request copy
+            first_match = self._find_first_match(content_lower, automaton, longest_term)
+        else:
+            # Lowercase growing windows and stop at the first match instead of copying the
+            # whole document. Windows overlap by longest_term - 1 so no match is split;
+            # only matches starting inside the window proper are final.
+            first_match = len(content)
+            pos, window = 0, 4096
+            while pos < len(content):
+                segment = content[pos:pos + window + longest_term - 1].lower()
+                match = self._find_first_match(segment, automaton, longest_term)
+                if match < window:
+                    first_match = pos + match
+                    break
+                pos += window
+                window *= 2
         
         # Extract snippet around first match
         start = max(0, first_match - max_length // 2)
@@ -183,4 +227,6 @@ if __name__ == '__main__':
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
     
-    app.run(host='0.0.0.0', port=8080, debug=True)
+    # Development server only; debug (reloader + debugger) is opt-in via SEARCH_API_DEBUG=1.
+    # In production serve app with a WSGI server, e.g. gunicorn -w 4 -k gevent api_server:app
+    app.run(host='0.0.0.0', port=8080, debug=os.environ.get('SEARCH_API_DEBUG', '0') == '1')
@@ -1,61 +1,172 @@
-import asyncio
 import heapq
-from typing import Optional, Tuple, Set
-from urllib.parse import urlparse
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
 import logging
+import xxhash
+from .bloom_filter import BloomFilter
+
+def url_id(url: str) -> int:
+    """64-bit id of a URL, used in place of the string for membership checks"""
+    return xxhash.xxh3_64_intdigest(url.encode('utf-8'))
 
 class URLInfo:
     """Container for URL information"""
-    def __init__(self, url: str, priority: float, discovery_time: float):
+    __slots__ = ('url', 'priority', 'discovery_time', '_domain')
+    
+    def __init__(self, url: str, priority: float, discovery_time: float, domain: Optional[str] = None):
         self.url = url
         self.priority = priority
         self.discovery_time = discovery_time
-        self.domain = urlparse(url).netloc
+        self._domain = domain
+    
+    @property
+    def domain(self) -> str:
+        """URL netloc, split on first access unless the caller supplied it"""
+        if self._domain is None:
+            self._domain = urlsplit(self.url).netloc
+        return self._domain
         
     def __lt__(self, other):
         # Higher priority URLs come first (reverse order for heapq)
         return self.priority > other.priority
 
 class URLFrontier:
-    """Priority queue for URLs to be crawled"""
+    """Politeness-aware URL frontier (Mercator style)
+
+    Each domain has its own priority heap; a top-level heap orders domains by
+    the time they may next be fetched, so get_next_url only returns URLs whose
+    domain delay has already elapsed.
+
+    Methods never await, so each call runs to completion on the event loop
+    without interleaving and needs no lock.
+    """
     
-    def __init__(self, max_size: int = 1000000):
+    def __init__(self, max_size: int = 1000000, delay_ms: int = 0,
+                 seen_capacity: int = 10000000, seen_error_rate: float = 0.001):
         self.max_size = max_size
-        self.queue = []
-        self.seen_urls: Set[str] = set()
-        self.lock = asyncio.Lock()
+        self.delay = delay_ms / 1000.0
+        self.domain_queues: Dict[str, List[URLInfo]] = {}  # domain -> priority heap
+        self.ready_heap: List[Tuple[float, str]] = []  # (next_ready_ts, domain), one per queued domain
+        # Idle domains still inside their delay -> earliest next fetch (monotonic), oldest first
+        self.domain_ready: OrderedDict[str, float] = OrderedDict()
+        self.queued = 0
+        self.seen_bloom = BloomFilter(capacity=seen_capacity, error_rate=seen_error_rate)
         self.logger = logging.getLogger(__name__)
         
-    async def add_url(self, url: str, priority: float = 0.5) -> bool:
+    def add_url(self, url: str, priority: float = 0.5, domain: Optional[str] = None) -> bool:
         """Add URL to frontier if not already seen"""
-        async with self.lock:
-            if url in self.seen_urls:
-                return False
-            
-            if len(self.queue) >= self.max_size:
+        uid = url_id(url)
+        if uid in self.seen_bloom:
+            return False
+        
+        if self.queued >= self.max_size:
+            self.logger.warning("URL frontier at maximum capacity")
+            return False
+        
+        # Only allocate once the URL is known to be new and fits
+        url_info = URLInfo(url, priority, time.time(), domain)
+        self._enqueue(url_info.domain, [url_info])
+        self.queued += 1
+        self.seen_bloom.add(uid)
+        
+        return True
+    
+    def add_urls(self, items: List[Tuple[str, float, Optional[str]]]) -> int:
+        """Add many (url, priority, domain) items at once, return how many were queued
+
+        domain may be None, in which case it is split from the URL.
+        """
+        discovery_time = time.time()
+        batches: Dict[str, List[URLInfo]] = {}
+        added = 0
+        
+        for url, priority, domain in items:
+            if self.queued + added >= self.max_size:
                 self.logger.warning("URL frontier at maximum capacity")
-                return False
+                break
             
-            import time
-            url_info = URLInfo(url, priority, time.time())
-            heapq.heappush(self.queue, url_info)
-            self.seen_urls.add(url)
+            # Test-and-set in one pass; also drops repeats within the batch
+            if not self.seen_bloom.add(url_id(url)):
+                continue
             
-            return True
+            url_info = URLInfo(url, priority, discovery_time, domain)
+            batches.setdefault(url_info.domain, []).append(url_info)
+            added += 1
+        
+        for domain, url_infos in batches.items():
+            self._enqueue(domain, url_infos)
+        self.queued += added
+        
+        return added
     
-    async def get_next_url(self) -> Optional[Tuple[str, float]]:
-        """Get next URL to crawl with its priority"""
-        async with self.lock:
-            if not self.queue:
-                return None
-            
-            url_info = heapq.heappop(self.queue)
-            return url_info.url, url_info.priority
+    def _enqueue(self, domain: str, url_infos: List[URLInfo]) -> None:
+        """Push URLs onto a domain's heap, scheduling the domain if it was idle"""
+        domain_queue = self.domain_queues.get(domain)
+        if domain_queue is None:
+            # Domain was idle: schedule it for its next allowed fetch
+            domain_queue = self.domain_queues[domain] = []
+            heapq.heappush(self.ready_heap, (self.domain_ready.pop(domain, 0.0), domain))
+        
+        # Re-heapify in O(n) when the batch is large relative to the heap
+        if len(url_infos) > 1 and len(url_infos) >= len(domain_queue):
+            domain_queue.extend(url_infos)
+            heapq.heapify(domain_queue)
+        else:
+            for url_info in url_infos:
+                heapq.heappush(domain_queue, url_info)
+    
+    def get_next_url(self) -> Optional[Tuple[str, float]]:
+        """Get next politeness-cleared URL to crawl with its priority"""
+        if not self.ready_heap:
+            return None
+        
+        now = time.monotonic()
+        self._expire_domain_ready(now)
+        ready_ts, domain = self.ready_heap[0]
+        if ready_ts > now:
+            return None
+        
+        heapq.heappop(self.ready_heap)
+        domain_queue = self.domain_queues[domain]
+        url_info = heapq.heappop(domain_queue)
+        self.queued -= 1
+        
+        next_ready = now + self.delay
+        if domain_queue:
+            heapq.heappush(self.ready_heap, (next_ready, domain))
+        else:
+            # Remember the delay only until it passes, in case the domain is re-queued
+            del self.domain_queues[domain]
+            if self.delay > 0:
+                self.domain_ready[domain] = next_ready
+        
+        return url_info.url, url_info.priority
+    
+    def _expire_domain_ready(self, now: float) -> None:
+        """Forget idle domains whose delay has passed
+
+        Entries are added at now + delay with a monotonic clock, so the
+        OrderedDict is sorted by ready time and expiry pops from the front.
+        """
+        domain_ready = self.domain_ready
+        while domain_ready:
+            domain, ready_ts = next(iter(domain_ready.items()))
+            if ready_ts > now:
+                break
+            domain_ready.popitem(last=False)
+    
+    def seconds_until_ready(self, default: float = 1.0) -> float:
+        """Seconds until some domain may be fetched (default if frontier is empty)"""
+        if not self.ready_heap:
+            return default
+        return max(0.0, self.ready_heap[0][0] - time.monotonic())
     
     def size(self) -> int:
         """Get current queue size"""
-        return len(self.queue)
+        return self.queued
     
     def is_empty(self) -> bool:
         """Check if frontier is empty"""
-        return len(self.queue) == 0
+        return self.queued == 0